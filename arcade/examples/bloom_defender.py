@@ -11,6 +11,9 @@
 
 import arcade
 import random
+from array import array
+
+from arcade.gl import BufferDescription
 
 # --- Bloom related ---
 from arcade.experimental import postprocessing
@@ -31,6 +34,10 @@
 VIEWPORT_MARGIN = SCREEN_WIDTH / 2 - 50
 TOP_VIEWPORT_MARGIN = 30
 DEFAULT_BOTTOM_VIEWPORT = -10
+# Where the right and top scroll boundaries are, measured from the left and
+# bottom of the screen
+RIGHT_VIEWPORT_BOUNDARY = SCREEN_WIDTH - VIEWPORT_MARGIN
+TOP_VIEWPORT_BOUNDARY = SCREEN_HEIGHT - TOP_VIEWPORT_MARGIN
 
 # Control the physics of how the player moves
 MAX_HORIZONTAL_MOVEMENT_SPEED = 10
@@ -39,9 +46,25 @@
 VERTICAL_ACCELERATION = 0.2
 MOVEMENT_DRAG = 0.08
 
-# How far the bullet travels before disappearing
+# Stars are split into columns this wide, so only the columns near the
+# screen get drawn
+STAR_BIN_WIDTH = 500
+STAR_BIN_COUNT = (PLAYING_FIELD_WIDTH + STAR_BIN_WIDTH - 1) // STAR_BIN_WIDTH
+
+# Size of a bullet, and how far it travels before disappearing
+BULLET_WIDTH = 35
+BULLET_HEIGHT = 3
 BULLET_MAX_DISTANCE = SCREEN_WIDTH * 0.75
 
+# How much explosion particles fade each frame
+PARTICLE_FADE_RATE = 5
+
+# Every velocity an explosion particle can start with. Particles never sit still.
+PARTICLE_VELOCITIES = [(change_x, change_y)
+                       for change_x in range(-2, 3)
+                       for change_y in range(-2, 3)
+                       if (change_x, change_y) != (0, 0)]
+
 
 class Player(arcade.SpriteSolidColor):
     """ Player ship """
@@ -78,6 +101,11 @@ def accelerate_left(self):
 
     def update(self):
         """ Move the player """
+        # Nothing to do if the player is standing still. The bounds were
+        # already checked on the frame it stopped.
+        if self.change_x == 0 and self.change_y == 0:
+            return
+
         # Move
         self.center_x += self.change_x
         self.center_y += self.change_y
@@ -109,34 +137,232 @@ def update(self):
             self.top = SCREEN_HEIGHT - 1
 
 
-class Bullet(arcade.SpriteSolidColor):
-    """ Bullet """
+class BulletSystem:
+    """
+    Bullets, drawn with instancing.
+
+    Every bullet is the same white rectangle, so instead of a sprite per
+    bullet, the bullet positions are written to buffers on the GPU and
+    the rectangle is drawn once per bullet with a single draw call.
+    """
+    def __init__(self, ctx):
+        """ Set up an empty bullet system """
+        self.center_x = array("f")
+        self.center_y = array("f")
+        self.change_x = array("f")
+        self.distance = array("f")
+
+        self.program = ctx.program(
+            vertex_shader="""
+            #version 330
+
+            // Arcade's global projection
+            uniform WindowBlock {
+                mat4 projection;
+                mat4 view;
+            } window;
+
+            uniform vec2 size;
+
+            // Corner of the rectangle
+            in vec2 in_vert;
+            // Per bullet data
+            in float in_x;
+            in float in_y;
+
+            void main() {
+                vec2 pos = vec2(in_x, in_y) + in_vert * size;
+                gl_Position = window.projection * window.view * vec4(pos, 0.0, 1.0);
+            }
+            """,
+            fragment_shader="""
+            #version 330
+
+            uniform vec4 color;
+
+            out vec4 out_color;
+
+            void main() {
+                out_color = color;
+            }
+            """
+        )
+        self.program["size"] = BULLET_WIDTH, BULLET_HEIGHT
+        self.program["color"] = arcade.color.WHITE.normalized
+
+        # A rectangle of size 1x1 around (0, 0)
+        vertices = array("f", [
+            -0.5, -0.5,
+            0.5, -0.5,
+            -0.5, 0.5,
+            0.5, 0.5,
+        ])
+        # Room for 64 bullets to start with. This grows when needed.
+        self.buffer_x = ctx.buffer(reserve=64 * 4)
+        self.buffer_y = ctx.buffer(reserve=64 * 4)
+        self.geometry = ctx.geometry(
+            [
+                BufferDescription(ctx.buffer(data=vertices), "2f", ["in_vert"]),
+                BufferDescription(self.buffer_x, "1f", ["in_x"], instanced=True),
+                BufferDescription(self.buffer_y, "1f", ["in_y"], instanced=True),
+            ],
+            mode=ctx.TRIANGLE_STRIP,
+        )
 
-    def __init__(self, width, height, color):
-        super().__init__(width, height, color)
-        self.distance = 0
+    def fire(self, center_x, center_y, change_x):
+        """ Add a bullet """
+        self.center_x.append(center_x)
+        self.center_y.append(center_y)
+        self.change_x.append(change_x)
+        self.distance.append(0)
 
-    def update(self):
-        """ Move the particle, and fade out """
-        # Move
-        self.center_x += self.change_x
-        self.center_y += self.change_y
-        self.distance += self.change_x
-        if self.distance > BULLET_MAX_DISTANCE:
-            self.remove_from_sprite_lists()
+    def get_bounding_boxes(self):
+        """ Get the bounding boxes of the bullets as x, y, width and height lists """
+        count = len(self.center_x)
+        return self.center_x, self.center_y, [BULLET_WIDTH] * count, [BULLET_HEIGHT] * count
 
+    def update(self):
+        """ Move the bullets, and drop the ones that have gone far enough """
+        center_x = self.center_x
+        center_y = self.center_y
+        change_x = self.change_x
+        distance = self.distance
+
+        # Survivors are packed to the front of the arrays as we go
+        alive = 0
+        for i in range(len(center_x)):
+            d = distance[i] + abs(change_x[i])
+            if d > BULLET_MAX_DISTANCE:
+                continue
+
+            center_x[alive] = center_x[i] + change_x[i]
+            center_y[alive] = center_y[i]
+            change_x[alive] = change_x[i]
+            distance[alive] = d
+            alive += 1
+
+        del center_x[alive:]
+        del center_y[alive:]
+        del change_x[alive:]
+        del distance[alive:]
+
+    def draw(self):
+        """ Draw the bullets """
+        count = len(self.center_x)
+        if count == 0:
+            return
+
+        if count * 4 > self.buffer_x.size:
+            self.buffer_x.orphan(size=count * 8)
+            self.buffer_y.orphan(size=count * 8)
+        self.buffer_x.write(self.center_x)
+        self.buffer_y.write(self.center_y)
+        self.geometry.render(self.program, instances=count)
+
+
+class ParticleSystem:
+    """
+    Particles from explosions.
+
+    Instead of every particle being a sprite with its own ``update``
+    method, the state of all the particles is kept in parallel arrays
+    (one array per attribute) and stepped in a single loop. The sprites
+    are only used to draw the particles.
+    """
+    def __init__(self):
+        """ Set up an empty particle system """
+        self.sprite_list = arcade.SpriteList()
+        self.center_x = array("f")
+        self.center_y = array("f")
+        self.change_x = array("f")
+        self.change_y = array("f")
+        self.alpha = array("i")
+
+    def emit(self, center_x, center_y, change_x, change_y):
+        """ Add a particle """
+        sprite = arcade.SpriteSolidColor(4, 4, center_x, center_y, color=arcade.color.RED)
+        self.sprite_list.append(sprite)
+        self.center_x.append(center_x)
+        self.center_y.append(center_y)
+        self.change_x.append(change_x)
+        self.change_y.append(change_y)
+        self.alpha.append(sprite.alpha)
 
-class Particle(arcade.SpriteSolidColor):
-    """ Particle from explosion """
     def update(self):
-        """ Move the particle, and fade out """
-        # Move
-        self.center_x += self.change_x
-        self.center_y += self.change_y
-        # Fade
-        self.alpha -= 5
-        if self.alpha <= 0:
-            self.remove_from_sprite_lists()
+        """ Move the particles, fade them out, and drop the ones that are gone """
+        center_x = self.center_x
+        center_y = self.center_y
+        change_x = self.change_x
+        change_y = self.change_y
+        alpha = self.alpha
+
+        # Survivors are packed to the front of the arrays as we go
+        alive = 0
+        dead = []
+        for i, sprite in enumerate(self.sprite_list):
+            # Fade
+            a = alpha[i] - PARTICLE_FADE_RATE
+            if a <= 0:
+                dead.append(sprite)
+                continue
+
+            # Move
+            x = center_x[i] + change_x[i]
+            y = center_y[i] + change_y[i]
+            sprite.position = x, y
+            sprite.alpha = a
+
+            center_x[alive] = x
+            center_y[alive] = y
+            change_x[alive] = change_x[i]
+            change_y[alive] = change_y[i]
+            alpha[alive] = a
+            alive += 1
+
+        del center_x[alive:]
+        del center_y[alive:]
+        del change_x[alive:]
+        del change_y[alive:]
+        del alpha[alive:]
+
+        for sprite in dead:
+            self.sprite_list.remove(sprite)
+
+    def draw(self):
+        """ Draw the particles """
+        self.sprite_list.draw()
+
+
+def get_bounding_boxes(sprite_list):
+    """ Split the bounding boxes of the sprites into x, y, width and height lists """
+    return ([sprite.center_x for sprite in sprite_list],
+            [sprite.center_y for sprite in sprite_list],
+            [sprite.width for sprite in sprite_list],
+            [sprite.height for sprite in sprite_list])
+
+
+def check_for_hits(bullet_x, bullet_y, bullet_width, bullet_height,
+                   enemy_x, enemy_y, enemy_width, enemy_height):
+    """
+    Find every bullet and enemy whose bounding boxes overlap.
+
+    Working on flat lists of numbers keeps the sprite attribute lookups
+    out of the inner loop.
+
+    :return: List of ``(bullet_index, enemy_index)`` pairs
+    """
+    hits = []
+    enemy_range = range(len(enemy_x))
+    for i in range(len(bullet_x)):
+        x = bullet_x[i]
+        y = bullet_y[i]
+        width = bullet_width[i]
+        height = bullet_height[i]
+        for j in enemy_range:
+            if (abs(x - enemy_x[j]) < (width + enemy_width[j]) * 0.5
+                    and abs(y - enemy_y[j]) < (height + enemy_height[j]) * 0.5):
+                hits.append((i, j))
+    return hits
 
 
 class MyGame(arcade.Window):
@@ -150,9 +376,14 @@ def __init__(self, width, height, title):
 
         # Variables that will hold sprite lists
         self.player_list = None
-        self.star_sprite_list = None
+        self.star_bins = None
         self.enemy_sprite_list = None
-        self.bullet_sprite_list = None
+        # Enemies don't move, so their bounding boxes are only collected when
+        # they are created, and then kept in step with enemy_sprite_list
+        self.enemy_bounding_boxes = None
+        self.bullet_system = None
+        self.particle_system = None
+        self.ground_shape_list = None
 
         # Set up the player info
         self.player_sprite = None
@@ -165,6 +396,9 @@ def __init__(self, width, height, title):
 
         self.view_bottom = 0
         self.view_left = 0
+        # The viewport we want to draw with, and the one last set
+        self.main_viewport = (0, SCREEN_WIDTH, 0, SCREEN_HEIGHT)
+        self.last_viewport = None
 
         # Set the background color of the window
         self.background_color = arcade.color.BLACK
@@ -172,8 +406,9 @@ def __init__(self, width, height, title):
         # --- Bloom related ---
 
         # Frame to receive the glow, and color attachment to store each pixel's
-        # color data
-        self.bloom_color_attachment = self.ctx.texture((SCREEN_WIDTH, SCREEN_HEIGHT))
+        # color data. The bloom never reads alpha, so only store RGB.
+        self.bloom_color_attachment = self.ctx.texture((SCREEN_WIDTH, SCREEN_HEIGHT),
+                                                       components=3)
         self.bloom_screen = self.ctx.framebuffer(
             color_attachments=[self.bloom_color_attachment]
         )
@@ -183,35 +418,37 @@ def __init__(self, width, height, title):
         # the blur process. Down-sampling by 8 and having an item of 4x4 size, the item
         # will get missed 50% of the time in the x direction, and 50% of the time in the
         # y direction for a total of being missed 75% of the time.
-        down_sampling = 4
+        down_sampling = 2
         # Size of the screen we are glowing onto
         size = (SCREEN_WIDTH // down_sampling, SCREEN_HEIGHT // down_sampling)
-        # Gaussian blur parameters.
-        # To preview different values, see:
-        # https://observablehq.com/@jobleonard/gaussian-kernel-calculater
-        kernel_size = 21
-        sigma = 4
-        mu = 0
-        step = 1
+        # Dual filter blur parameters.
+        # Each level halves the size of the buffer being blurred, which roughly
+        # doubles the radius of the glow.
+        levels = 5
         # Control the intensity
-        multiplier = 2
+        contrast = 4
 
         # Create a post-processor to create a bloom
-        self.bloom_postprocessing = postprocessing.BloomEffect(size,
-                                                               kernel_size,
-                                                               sigma,
-                                                               mu,
-                                                               multiplier,
-                                                               step)
+        self.bloom_postprocessing = postprocessing.DualFilterBloomEffect(size,
+                                                                         levels,
+                                                                         contrast)
 
     def setup(self):
         """ Set up the game and initialize the variables. """
 
-        # Sprite lists
+        # Sprite lists.
+        # Every SpriteSolidColor uses the same white texture tinted by the
+        # sprite's color, so all of these lists draw from one texture atlas.
         self.player_list = arcade.SpriteList()
-        self.star_sprite_list = arcade.SpriteList()
+        self.star_bins = [arcade.SpriteList() for _ in range(STAR_BIN_COUNT)]
         self.enemy_sprite_list = arcade.SpriteList()
-        self.bullet_sprite_list = arcade.SpriteList()
+        self.bullet_system = BulletSystem(self.ctx)
+        self.particle_system = ParticleSystem()
+
+        # The ground never moves, so its geometry is only built once
+        self.ground_shape_list = arcade.shape_list.ShapeElementList()
+        self.ground_shape_list.append(
+            arcade.shape_list.create_line(0, 0, PLAYING_FIELD_WIDTH, 0, arcade.color.WHITE))
 
         # Set up the player
         self.player_sprite = Player()
@@ -219,19 +456,28 @@ def setup(self):
         self.player_sprite.center_y = 50
         self.player_list.append(self.player_sprite)
 
-        # Add stars
+        # Look these up once instead of on every pass through the loops
+        randrange = random.randrange
+        sprite_solid_color = arcade.SpriteSolidColor
+
+        # Add stars.
+        # Sprites are created at their position, rather than moved there
+        # afterwards, which would update their hit box twice for nothing.
+        star_color = arcade.color.WHITE
         for i in range(80):
-            sprite = arcade.SpriteSolidColor(4, 4, color=arcade.color.WHITE)
-            sprite.center_x = random.randrange(PLAYING_FIELD_WIDTH)
-            sprite.center_y = random.randrange(PLAYING_FIELD_HEIGHT)
-            self.star_sprite_list.append(sprite)
+            center_x = randrange(PLAYING_FIELD_WIDTH)
+            center_y = randrange(PLAYING_FIELD_HEIGHT)
+            sprite = sprite_solid_color(4, 4, center_x, center_y, color=star_color)
+            self.star_bins[center_x // STAR_BIN_WIDTH].append(sprite)
 
         # Add enemies
+        enemy_color = arcade.csscolor.LIGHT_SALMON
         for i in range(20):
-            sprite = arcade.SpriteSolidColor(20, 20, color=arcade.csscolor.LIGHT_SALMON)
-            sprite.center_x = random.randrange(PLAYING_FIELD_WIDTH)
-            sprite.center_y = random.randrange(PLAYING_FIELD_HEIGHT)
+            center_x = randrange(PLAYING_FIELD_WIDTH)
+            center_y = randrange(PLAYING_FIELD_HEIGHT)
+            sprite = sprite_solid_color(20, 20, center_x, center_y, color=enemy_color)
             self.enemy_sprite_list.append(sprite)
+        self.enemy_bounding_boxes = get_bounding_boxes(self.enemy_sprite_list)
 
     def on_draw(self):
         """ Render the screen. """
@@ -244,23 +490,23 @@ def on_draw(self):
         self.bloom_screen.use()
         self.bloom_screen.clear(arcade.color.TRANSPARENT_BLACK)
 
-        arcade.set_viewport(self.view_left,
-                            SCREEN_WIDTH + self.view_left,
-                            self.view_bottom,
-                            SCREEN_HEIGHT + self.view_bottom)
+        self.apply_viewport(self.main_viewport)
 
         # Draw all the sprites on the screen that should have a bloom
-        self.star_sprite_list.draw()
-        self.bullet_sprite_list.draw()
-
-        # Now draw to the actual screen
+        # Only draw the star columns overlapping the screen, plus one on each
+        # side for stars straddling the edge and for their glow
+        first_bin = max(0, self.view_left // STAR_BIN_WIDTH - 1)
+        last_bin = min(STAR_BIN_COUNT - 1,
+                       (self.view_left + SCREEN_WIDTH) // STAR_BIN_WIDTH + 1)
+        for star_bin in self.star_bins[first_bin:last_bin + 1]:
+            star_bin.draw()
+        self.bullet_system.draw()
+        self.particle_system.draw()
+
+        # Now draw to the actual screen. The projection set above is shared
+        # by all framebuffers, so it doesn't need to be set again.
         self.use()
 
-        arcade.set_viewport(self.view_left,
-                            SCREEN_WIDTH + self.view_left,
-                            self.view_bottom,
-                            SCREEN_HEIGHT + self.view_bottom)
-
         # --- Bloom related ---
 
         # Draw the bloom layers
@@ -271,7 +517,7 @@ def on_draw(self):
         self.player_list.draw()
 
         # Draw the ground
-        arcade.draw_line(0, 0, PLAYING_FIELD_WIDTH, 0, arcade.color.WHITE)
+        self.ground_shape_list.draw()
 
     def on_update(self, delta_time):
         """ Movement and game logic """
@@ -289,40 +535,51 @@ def on_update(self, delta_time):
 
         # Call update to move the sprite
         self.player_list.update()
-        self.bullet_sprite_list.update()
-
-        for bullet in self.bullet_sprite_list:
-            enemy_hit_list = arcade.check_for_collision_with_list(bullet,
-                                                                  self.enemy_sprite_list)
-            for enemy in enemy_hit_list:
-                enemy.remove_from_sprite_lists()
-                for i in range(10):
-                    particle = Particle(4, 4, arcade.color.RED)
-                    while particle.change_y == 0 and particle.change_x == 0:
-                        particle.change_y = random.randrange(-2, 3)
-                        particle.change_x = random.randrange(-2, 3)
-                    particle.center_x = enemy.center_x
-                    particle.center_y = enemy.center_y
-                    self.bullet_sprite_list.append(particle)
-
-        # Scroll left
-        left_boundary = self.view_left + VIEWPORT_MARGIN
-        if self.player_sprite.left < left_boundary:
-            self.view_left -= left_boundary - self.player_sprite.left
-
-        # Scroll right
-        right_boundary = self.view_left + SCREEN_WIDTH - VIEWPORT_MARGIN
-        if self.player_sprite.right > right_boundary:
-            self.view_left += self.player_sprite.right - right_boundary
-
-        # Scroll up
-        self.view_bottom = DEFAULT_BOTTOM_VIEWPORT
-        top_boundary = self.view_bottom + SCREEN_HEIGHT - TOP_VIEWPORT_MARGIN
-        if self.player_sprite.top > top_boundary:
-            self.view_bottom += self.player_sprite.top - top_boundary
-
-        self.view_left = int(self.view_left)
-        self.view_bottom = int(self.view_bottom)
+        self.bullet_system.update()
+        self.particle_system.update()
+
+        # Test every bullet against every enemy in one go
+        hits = check_for_hits(*self.bullet_system.get_bounding_boxes(),
+                              *self.enemy_bounding_boxes)
+        # An enemy hit by several bullets only explodes once. Enemies are
+        # removed from the back so the indexes of the others stay valid.
+        for j in sorted({j for _, j in hits}, reverse=True):
+            enemy = self.enemy_sprite_list[j]
+            enemy.remove_from_sprite_lists()
+            for values in self.enemy_bounding_boxes:
+                del values[j]
+            for i in range(10):
+                change_x, change_y = random.choice(PARTICLE_VELOCITIES)
+                self.particle_system.emit(enemy.center_x, enemy.center_y,
+                                          change_x, change_y)
+
+        # Scroll left or right, keeping the player at least VIEWPORT_MARGIN
+        # away from the edges of the screen
+        view_left = min(self.view_left, self.player_sprite.left - VIEWPORT_MARGIN)
+        view_left = max(view_left, self.player_sprite.right - RIGHT_VIEWPORT_BOUNDARY)
+        self.view_left = int(view_left)
+
+        # Scroll up, keeping the player at least TOP_VIEWPORT_MARGIN away
+        # from the top of the screen
+        self.view_bottom = int(max(DEFAULT_BOTTOM_VIEWPORT,
+                                   self.player_sprite.top - TOP_VIEWPORT_BOUNDARY))
+        self.main_viewport = (self.view_left,
+                              SCREEN_WIDTH + self.view_left,
+                              self.view_bottom,
+                              SCREEN_HEIGHT + self.view_bottom)
+
+    def apply_viewport(self, viewport):
+        """ Set the viewport, unless it is already the one in use """
+        if viewport == self.last_viewport:
+            return
+        arcade.set_viewport(*viewport)
+        self.last_viewport = viewport
+
+    def on_resize(self, width, height):
+        """ Called when the window is resized """
+        super().on_resize(width, height)
+        # The default handler resets the viewport
+        self.last_viewport = None
 
     def on_key_press(self, key, modifiers):
         """Called whenever a key is pressed. """
@@ -337,15 +594,14 @@ def on_key_press(self, key, modifiers):
             self.right_pressed = True
         elif key == arcade.key.SPACE:
             # Shoot out a bullet/laser
-            bullet = arcade.SpriteSolidColor(35, 3, arcade.color.WHITE)
-            bullet.center_x = self.player_sprite.center_x
-            bullet.center_y = self.player_sprite.center_y
-            bullet.change_x = max(12, abs(self.player_sprite.change_x) + 10)
+            change_x = max(12, abs(self.player_sprite.change_x) + 10)
 
             if not self.player_sprite.face_right:
-                bullet.change_x *= -1
+                change_x *= -1
 
-            self.bullet_sprite_list.append(bullet)
+            self.bullet_system.fire(self.player_sprite.center_x,
+                                    self.player_sprite.center_y,
+                                    change_x)
 
     def on_key_release(self, key, modifiers):
         """Called when the user releases a key. """
@@ -103,13 +103,8 @@ def __init__(self, width, height, title):
 
     def on_draw(self):
         self.clear()
-        try:
-            self.program['time'] = self.time
-            self.points.render(self.program, mode=self.ctx.POINTS)
-        except Exception:
-            import traceback
-            traceback.print_exc()
-            exit(1)
+        self.program['time'] = self.time
+        self.points.render(self.program, mode=self.ctx.POINTS)
 
     def on_update(self, dt):
         self.time += dt
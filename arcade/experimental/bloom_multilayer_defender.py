@@ -1,12 +1,11 @@
 """
 Defender Clone.
 
-This example shows how to:
-1. Create a mini-map
-2. Create a 'bloom' or 'glow' effect.
+This example shows how to create multiple layers of 'bloom' or 'glow'
+effect, each with its own intensity.
 
 If Python and Arcade are installed, this example can be run from the command line with:
-python -m arcade.examples.defender
+python -m arcade.experimental.bloom_multilayer_defender
 """
 
 from __future__ import annotations
@@ -144,6 +144,76 @@ def render(self, source: Texture2D) -> Texture2D:
         return self._blur_y.render(blurred_x)
 
 
+class DualFilterBlur(PostProcessing):
+    """
+    Blur using dual filtering (Marius Bjorge, SIGGRAPH 2015).
+
+    The source is down-sampled through a chain of buffers, each half the
+    size of the previous one, using a 4-tap filter. It is then up-sampled
+    back using an 8-tap tent filter, adding every level on the way up.
+    Most of the work is done on the small buffers, so far fewer texels
+    are fetched than with a separable gaussian blur of the same radius.
+
+    :param size: Size of the source
+    :param levels: Number of times the source is halved
+    :param full_size: Up-sample the result all the way back to full size.
+        If ``False`` the result is left at half size, for callers that
+        do the last up-sample themselves while drawing it. No full size
+        buffer is allocated in that case.
+    """
+    def __init__(self, size: Tuple[int, int], levels: int = 5, full_size: bool = True):
+        super().__init__(size)
+        self._levels = levels
+        # Every buffer is half the size of the one before it.
+        # Buffer 0 is full size and only exists if it receives the result.
+        self._fbos = []
+        for level in range(0 if full_size else 1, levels + 1):
+            self._fbos.append(self.ctx.framebuffer(
+                color_attachments=self.ctx.texture((max(1, size[0] >> level),
+                                                    max(1, size[1] >> level)),
+                                                   components=3,
+                                                   wrap_x=self.ctx.CLAMP_TO_EDGE,
+                                                   wrap_y=self.ctx.CLAMP_TO_EDGE)))
+        self._full_size = full_size
+        self._down_program = self.ctx.load_program(
+            vertex_shader=':system:shaders/texture_default_projection_vs.glsl',
+            fragment_shader=':system:shaders/postprocessing/dual_filter_down_fs.glsl',
+        )
+        self._up_program = self.ctx.load_program(
+            vertex_shader=':system:shaders/texture_default_projection_vs.glsl',
+            fragment_shader=':system:shaders/postprocessing/dual_filter_up_fs.glsl',
+        )
+        self._quad_fs = geometry.quad_2d_fs()
+
+    def _blit(self, program, source: Texture2D, fbo) -> Texture2D:
+        """ Filter the source into the given framebuffer """
+        fbo.use()
+        source.use(0)
+        program['half_pixel'] = 0.5 / fbo.width, 0.5 / fbo.height
+        self._quad_fs.render(program)
+        return fbo.color_attachments[0]
+
+    def render(self, source: Texture2D) -> Texture2D:
+        """ Render """
+        pyramid = self._fbos[1:] if self._full_size else self._fbos
+        texture = source
+        for fbo in pyramid:
+            texture = self._blit(self._down_program, texture, fbo)
+
+        # Each up-sampled level is added on top of what was down-sampled into
+        # that buffer, so the glow stays bright close to small objects.
+        if self._full_size:
+            # Nothing was down-sampled into the full size buffer
+            self._fbos[0].clear()
+        blend_func = self.ctx.blend_func
+        self.ctx.blend_func = self.ctx.BLEND_ADDITIVE
+        with self.ctx.enabled(self.ctx.BLEND):
+            for fbo in reversed(self._fbos[:-1]):
+                texture = self._blit(self._up_program, texture, fbo)
+        self.ctx.blend_func = blend_func
+        return texture
+
+
 class BloomEffect(PostProcessing):
     """ Post processing to create a bloom/glow effect. """
     def __init__(self,
@@ -177,7 +247,9 @@ def __init__(self,
             step=step,
         )
 
-        # Program and buffer doing contrast / brightness / luma
+        # Program and buffer doing contrast / brightness / luma.
+        # The threshold is taken at half the blur resolution, so the
+        # full size source is only sampled sparsely.
         luma_tex = self.ctx.texture((self.width // 2, self.height // 2), components=3)
         luma_tex.wrap_x = self.ctx.CLAMP_TO_EDGE
         luma_tex.wrap_y = self.ctx.CLAMP_TO_EDGE
@@ -202,6 +274,7 @@ def render(self, source, target):
         # self._cb_luma_program['brightness'] = 0.0
         self._cb_luma_buffer.use()
         self._cb_luma_buffer.clear()
+        source.use(0)
         self._quad_fs.render(self._cb_luma_program)
 
         blurred = self._gaussian_1.render(self._cb_luma_buffer.color_attachments[0])
@@ -215,3 +288,58 @@ def render(self, source, target):
         self._combine_program['color_buffer'] = 0
         self._combine_program['blur_buffer'] = 1
         self._quad_fs.render(self._combine_program)
+
+
+class DualFilterBloomEffect(PostProcessing):
+    """
+    Post processing to create a bloom/glow effect, blurred with a
+    :py:class:`DualFilterBlur`.
+
+    :param size: Size of the buffer the bright parts of the source are
+        extracted to and blurred at.
+    :param levels: How many times the blur halves the buffer size.
+        Each level roughly doubles the radius of the glow.
+    :param contrast: How much the source is brightened before blurring
+    """
+    def __init__(self, size, levels: int = 5, contrast: float = 4.0):
+        super().__init__(size)
+        self._contrast = contrast
+
+        # Program and buffer doing contrast / brightness / luma
+        luma_tex = self.ctx.texture(size, components=3)
+        luma_tex.wrap_x = self.ctx.CLAMP_TO_EDGE
+        luma_tex.wrap_y = self.ctx.CLAMP_TO_EDGE
+        self._cb_luma_buffer = self.ctx.framebuffer(color_attachments=[luma_tex])
+        self._cb_luma_program = self.ctx.load_program(
+            vertex_shader=':system:shaders/postprocessing/glow_filter_vs.glsl',
+            fragment_shader=':system:shaders/postprocessing/glow_filter_fs.glsl'
+        )
+
+        self._blur = DualFilterBlur(size, levels=levels, full_size=False)
+
+        # Program for combining the original buffer and the blurred buffer.
+        # It also does the last up-sample of the blur, saving a pass.
+        self._combine_program = self.ctx.load_program(
+            vertex_shader=':system:shaders/texture_default_projection_vs.glsl',
+            fragment_shader=':system:shaders/postprocessing/dual_filter_combine_fs.glsl'
+        )
+        self._quad_fs = geometry.quad_2d_fs()
+
+    def render(self, source, target):
+        """ Render """
+        self._cb_luma_program['contrast'] = self._contrast
+        self._cb_luma_buffer.use()
+        self._cb_luma_buffer.clear()
+        source.use(0)
+        self._quad_fs.render(self._cb_luma_program)
+
+        blurred = self._blur.render(self._cb_luma_buffer.color_attachments[0])
+
+        # Draw combined result to screen
+        target.use()
+        source.use(0)
+        blurred.use(1)
+        self._combine_program['color_buffer'] = 0
+        self._combine_program['blur_buffer'] = 1
+        self._combine_program['half_pixel'] = 0.5 / self.width, 0.5 / self.height
+        self._quad_fs.render(self._combine_program)
@@ -0,0 +1,24 @@
+#version 330
+
+// Add the blur on top of the color buffer.
+// The blur is still at half size, so the last dual filter up-sample
+// (an 8-tap tent filter) is done here while reading it.
+
+uniform sampler2D color_buffer;
+uniform sampler2D blur_buffer;
+uniform vec2 half_pixel;
+
+in vec2 v_uv;
+out vec4 f_color;
+
+void main() {
+    vec4 sum = texture(blur_buffer, v_uv + vec2(-half_pixel.x * 2.0, 0.0));
+    sum += texture(blur_buffer, v_uv + vec2(-half_pixel.x, half_pixel.y)) * 2.0;
+    sum += texture(blur_buffer, v_uv + vec2(0.0, half_pixel.y * 2.0));
+    sum += texture(blur_buffer, v_uv + vec2(half_pixel.x, half_pixel.y)) * 2.0;
+    sum += texture(blur_buffer, v_uv + vec2(half_pixel.x * 2.0, 0.0));
+    sum += texture(blur_buffer, v_uv + vec2(half_pixel.x, -half_pixel.y)) * 2.0;
+    sum += texture(blur_buffer, v_uv + vec2(0.0, -half_pixel.y * 2.0));
+    sum += texture(blur_buffer, v_uv + vec2(-half_pixel.x, -half_pixel.y)) * 2.0;
+    f_color = texture(color_buffer, v_uv) + vec4(sum.rgb / 12.0, 1.0);
+}
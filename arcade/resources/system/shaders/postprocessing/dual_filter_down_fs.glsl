@@ -0,0 +1,20 @@
+#version 330
+
+// Dual filter down-sample (Marius Bjorge, SIGGRAPH 2015).
+// One tap in the center and four taps on the corners, all using
+// bilinear filtering so each tap averages four texels.
+
+uniform sampler2D texture0;
+uniform vec2 half_pixel;
+
+in vec2 v_uv;
+out vec4 f_color;
+
+void main() {
+    vec4 sum = texture(texture0, v_uv) * 4.0;
+    sum += texture(texture0, v_uv - half_pixel);
+    sum += texture(texture0, v_uv + half_pixel);
+    sum += texture(texture0, v_uv + vec2(half_pixel.x, -half_pixel.y));
+    sum += texture(texture0, v_uv - vec2(half_pixel.x, -half_pixel.y));
+    f_color = vec4(sum.rgb / 8.0, 1.0);
+}
@@ -0,0 +1,23 @@
+#version 330
+
+// Dual filter up-sample (Marius Bjorge, SIGGRAPH 2015).
+// An 8-tap tent filter: four taps on the edges and four heavier
+// taps on the diagonals.
+
+uniform sampler2D texture0;
+uniform vec2 half_pixel;
+
+in vec2 v_uv;
+out vec4 f_color;
+
+void main() {
+    vec4 sum = texture(texture0, v_uv + vec2(-half_pixel.x * 2.0, 0.0));
+    sum += texture(texture0, v_uv + vec2(-half_pixel.x, half_pixel.y)) * 2.0;
+    sum += texture(texture0, v_uv + vec2(0.0, half_pixel.y * 2.0));
+    sum += texture(texture0, v_uv + vec2(half_pixel.x, half_pixel.y)) * 2.0;
+    sum += texture(texture0, v_uv + vec2(half_pixel.x * 2.0, 0.0));
+    sum += texture(texture0, v_uv + vec2(half_pixel.x, -half_pixel.y)) * 2.0;
+    sum += texture(texture0, v_uv + vec2(0.0, -half_pixel.y * 2.0));
+    sum += texture(texture0, v_uv + vec2(-half_pixel.x, -half_pixel.y)) * 2.0;
+    f_color = vec4(sum.rgb / 12.0, 1.0);
+}